@@ -10,18 +10,17 @@ from rich.console import Console
 from rich.markdown import Markdown
 from rich.live import Live
 from pathlib import Path
-from tools.tools import (
-    tools, 
-    search_web, 
-    local_rag, 
-    url_search, 
-    code_search
+from tools.tools import tools, tool_functions
+from utils.prompt import (
+    SYSTEM_MESSAGE,
+    append_to_chat_history,
+    chat_history_window
 )
-from utils.prompt import SYSTEM_MESSAGE, append_to_chat_history
 
 import argparse
 import sys
 import json
+import time
 
 parser = argparse.ArgumentParser(
     description='RAG-powered chatbot with optional web search and local PDF support'
@@ -63,6 +62,14 @@ parser.add_argument(
     default='http://localhost:8080/v1',
     help='OpenAI API base URL (default: http://localhost:8080/v1)'
 )
+parser.add_argument(
+    '--max-history-turns',
+    type=int,
+    default=0,
+    help='maximum number of recent user turns sent to the model, older \
+          turns are dropped in blocks of half this size, 0 sends the \
+          full history (default: 0)'
+)
 # parser.add_argument(
 #     '--code-dir',
 #     type=str,
@@ -71,6 +78,13 @@ parser.add_argument(
 # )
 args = parser.parse_args()
 
+# Ask llama.cpp to reuse the KV cache for the shared prompt prefix (system
+# message + earlier turns) instead of re-evaluating it on every request.
+LLAMA_CPP_EXTRA_BODY = {'cache_prompt': True}
+
+# Seconds between Markdown re-renders of the streamed response.
+MARKDOWN_RENDER_INTERVAL = 0.1
+
 # Initialize Rich console
 console = Console()
 
@@ -128,6 +142,12 @@ def run_chat_loop(client, args, messages, console):
     Returns:
         messages: Updated chat history
     """
+    # Results of tool calls made while answering the current user message,
+    # keyed by tool name and canonical arguments, so repeated calls within a
+    # turn skip the underlying tool. Cleared every turn so later turns see
+    # fresh web results and the current state of the user's files.
+    tool_results = {}
+
     while True:
         try:
             user_input = console.input("[bold blue]You: [/bold blue]").strip()
@@ -138,6 +158,7 @@ def run_chat_loop(client, args, messages, console):
                 console.print("[yellow]Goodbye![/yellow]")
                 break
 
+            tool_results.clear()
             context_sources = []
             search_results = []
             ### Web search and context addition starts here ###
@@ -182,10 +203,13 @@ def run_chat_loop(client, args, messages, console):
             try:
                 stream = client.chat.completions.create(
                     model=args.model,
-                    messages=messages,
+                    messages=chat_history_window(
+                        messages, args.max_history_turns
+                    ),
                     stream=True,
                     tools=tools,
                     tool_choice='auto',
+                    extra_body=LLAMA_CPP_EXTRA_BODY,
                 )
 
                 # print(event.choices[0].delta.content for event in stream)  # Debug: Print each event received from the stream
@@ -222,17 +246,17 @@ def run_chat_loop(client, args, messages, console):
 
                 tool_call_count += 1
                 console.print(f"[bold cyan]Tool call {tool_call_count}: {tool_name} ::: Args: {tool_args}[/bold cyan]")
-                tool_args = json.loads(tool_args)
+                tool_kwargs = json.loads(tool_args)
         
-                # Execute tool call.
-                if tool_name == 'search_web':
-                    result = search_web(**tool_args)
-                elif tool_name == 'local_rag':
-                    result = local_rag(**tool_args)
-                elif tool_name == 'url_search':
-                    result = url_search(**tool_args)
-                elif tool_name == 'code_search':
-                    result = code_search(**tool_args)
+                # Execute tool call, reusing the result of an identical earlier call.
+                tool_key = (tool_name, json.dumps(tool_kwargs, sort_keys=True))
+                tool_function = tool_functions.get(tool_name)
+                if tool_key in tool_results:
+                    console.print(f"[dim][cached] Reusing earlier {tool_name} result[/dim]")
+                    result = tool_results[tool_key]
+                elif tool_function is not None:
+                    result = tool_function(**tool_kwargs)
+                    tool_results[tool_key] = result
                 else:
                     console.print(f"[yellow]Warning: Unknown tool: {tool_name}[/yellow]")
                     result = f"Error: Unknown tool: {tool_name}"
@@ -245,7 +269,7 @@ def run_chat_loop(client, args, messages, console):
                     tool_call_id=tool_id,
                     tool_identifier=True,
                     tool_name=tool_name,
-                    tool_args=json.dumps(tool_args)
+                    tool_args=tool_args
                 )
 
                 # Append tool result.
@@ -262,10 +286,13 @@ def run_chat_loop(client, args, messages, console):
                 console.print(f"[dim]Checking if more tools are needed...[/dim]")
                 stream = client.chat.completions.create(
                     model=args.model,
-                    messages=messages,
+                    messages=chat_history_window(
+                        messages, args.max_history_turns
+                    ),
                     stream=True,
                     tools=tools,
                     tool_choice='auto',
+                    extra_body=LLAMA_CPP_EXTRA_BODY,
                 )
 
             if tool_call_count >= MAX_TOOL_CALLS:
@@ -288,16 +315,23 @@ def run_chat_loop(client, args, messages, console):
             with Live(
                 Markdown(''), 
                 console=console, 
-                refresh_per_second=10,
+                refresh_per_second=1 / MARKDOWN_RENDER_INTERVAL,
                 # vertical_overflow='visible'
                 vertical_overflow='ellipsis'
             ) as live:
+                # Markdown() re-parses the whole buffer, so only rebuild it
+                # at the Live refresh rate instead of once per token.
+                last_render = 0.0
                 for event in stream:
                     stream_content = event.choices[0].delta.content
                     if stream_content is not None:
                         buffer += stream_content
-                        live.update(Markdown(buffer))
                         current_response += stream_content
+                        now = time.monotonic()
+                        if now - last_render >= MARKDOWN_RENDER_INTERVAL:
+                            live.update(Markdown(buffer))
+                            last_render = now
+                live.update(Markdown(buffer))
 
                 messages = append_to_chat_history('assistant', current_response, messages)
                 console.print()
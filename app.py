@@ -13,6 +13,7 @@ from semantic_engine import (
     create_and_upload_in_mem_collection,
     search_query
 )
+from utils.prompt import ASSISTANT_PREAMBLE
 
 # Terminal-style CSS to mimic Rich console
 TERMINAL_CSS = """
@@ -222,12 +223,6 @@ h1, h2, h3, h4 {
 }
 """
 
-# System message
-SYSTEM_MESSAGE = """
-You are a helpful assistant. You never say you are an OpenAI model or chatGPT.
-You are here to help the user with their requests.
-When the user asks who are you, you say that you are a helpful AI assistant.
-"""
 
 # Global state for RAG collection
 rag_ready = False
@@ -271,7 +266,7 @@ def chat(message, history, api_url, model_name, enable_web_search, search_engine
         return
     
     # Build messages from history (Gradio 6.0 format: list of dicts with role/content)
-    messages = [{'role': 'system', 'content': SYSTEM_MESSAGE}]
+    messages = [{'role': 'system', 'content': ASSISTANT_PREAMBLE}]
     for msg in history:
         messages.append({'role': msg['role'], 'content': msg['content']})
     
@@ -9,8 +9,13 @@ from qdrant_client import models, QdrantClient
 from sentence_transformers import SentenceTransformer
 
 import pymupdf
+import torch
 
-encoder = SentenceTransformer('all-MiniLM-L6-v2')
+# Run the encoder on GPU in half precision when available.
+device = 'cuda' if torch.cuda.is_available() else 'cpu'
+encoder = SentenceTransformer('all-MiniLM-L6-v2', device=device)
+if device == 'cuda':
+    encoder.half()
 
 qdrant_client = QdrantClient(':memory:')
 
@@ -76,13 +81,18 @@ def create_and_upload_in_mem_collection(
         )
     )
 
+    # Encode all chunks in batches instead of one forward pass per chunk.
+    embeddings = encoder.encode(
+        [doc['text'] for doc in documents], batch_size=64
+    )
+
     qdrant_client.upload_points(
         collection_name=collection_name,
         points=[
             models.PointStruct(
-                id=idx, vector=encoder.encode(doc['text']).tolist(), payload=doc
+                id=idx, vector=embedding.tolist(), payload=doc
             )
-            for idx, doc in enumerate(documents)
+            for idx, (doc, embedding) in enumerate(zip(documents, embeddings))
         ],
     )
 
@@ -1,5 +1,23 @@
-from web_search import do_web_search, do_url_search
-from semantic_engine import search_query
+from web_search import (
+    do_web_search,
+    do_web_search_batch,
+    do_url_search,
+    SemanticSearchCache
+)
+from semantic_engine import search_query, encoder
+
+import os
+
+# Upper bound on concurrent web searches issued by search_web_multi.
+MAX_PARALLEL_SEARCHES = 5
+
+# Reuse results of rephrased queries, embedded with the RAG encoder.
+# Opt-in, as near-identical queries (e.g. differing only in a version
+# number) can match each other.
+if os.getenv('SEMANTIC_SEARCH_CACHE') == '1':
+    search_cache = SemanticSearchCache(encoder)
+else:
+    search_cache = None
 
 tools = [
     {
@@ -17,6 +35,21 @@ tools = [
             },
         },
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_web_multi",
+            "description": "Search the web for several topics at once. Prefer this over repeated search_web calls when more than one search is needed.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "topics": {"type": "array", "items": {"type": "string"}},
+                    "search_engine": {"type": "string", "default": "tavily"}
+                },
+                "required": ["topics", "search_engine"]
+            },
+        },
+    },
     {
         "type": "function",
         "function": {
@@ -68,10 +101,45 @@ tools = [
 def search_web(topic: str, search_engine: str) -> str:
     result =  do_web_search(
         topic, 
-        search_engine=search_engine
+        search_engine=search_engine,
+        semantic_cache=search_cache
     )
     return '\n'.join(result)
 
+def search_web_multi(topics: list, search_engine: str) -> str:
+    """
+    Run web searches for several topics concurrently, with at most
+    MAX_PARALLEL_SEARCHES requests in flight.
+
+    Args:
+        topics (list): Topics to search for.
+        search_engine (str): Search engine to use for every topic.
+
+    Returns:
+        str: Search results grouped by topic, with an error line for any
+            topic whose search failed.
+    """
+    # Small models sometimes pass a single topic as a plain string.
+    if isinstance(topics, str):
+        topics = [topics]
+    topics = [topic for topic in topics if isinstance(topic, str) and topic.strip()]
+    if not topics:
+        return "Error: No topics provided for search_web_multi"
+
+    results = do_web_search_batch(
+        topics,
+        search_engine=search_engine,
+        semantic_cache=search_cache,
+        max_workers=MAX_PARALLEL_SEARCHES
+    )
+    sections = []
+    for topic, result in zip(topics, results):
+        if isinstance(result, Exception):
+            sections.append(f"Results for '{topic}':\nError: {result}")
+        else:
+            sections.append(f"Results for '{topic}':\n" + '\n'.join(result))
+    return '\n\n'.join(sections)
+
 def local_rag(topic: str, top_k: int) -> str:
     hits, result = search_query(topic, top_k=top_k)
 
@@ -96,6 +164,7 @@ def code_search(directory: str, query: str, max_results: int = 100) -> str:
     Returns:
         str: String representation of matching lines with file paths.
     """
+    import itertools
     import subprocess
     from pathlib import Path
 
@@ -114,18 +183,33 @@ def code_search(directory: str, query: str, max_results: int = 100) -> str:
             query,
             directory,
         ]
-        result = subprocess.run(grep_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-        if result.returncode != 0:
+        process = subprocess.Popen(grep_command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+
+        # Read only the first max_results lines and stop grep afterwards
+        # instead of buffering its full output for large directories.
+        try:
+            matches = [line.rstrip('\n') for line in itertools.islice(process.stdout, max_results)]
+        finally:
+            process.kill()
+            process.stdout.close()
+            process.wait()
+
+        if not matches:
             return f"No matches found for query: {query}"
 
-        # Split the output into lines and limit the results
-        matches = result.stdout.strip().split("\n")
-        return '\n'.join(matches[:max_results])
-        # return '\n'.join(matches)
+        return '\n'.join(matches)
 
     except Exception as e:
         return f"Error during code search: {e}"
+
+# Map tool names from the schema above to their callables for dispatch.
+tool_functions = {
+    'search_web': search_web,
+    'search_web_multi': search_web_multi,
+    'local_rag': local_rag,
+    'url_search': url_search,
+    'code_search': code_search,
+}
     
 
 if __name__ == '__main__':
@@ -1,13 +1,18 @@
-SYSTEM_MESSAGE = """
+from typing import Final
+
+ASSISTANT_PREAMBLE: Final[str] = """
 You are a helpful assistant. You never say you are an OpenAI model or chatGPT.
 You are here to help the user with their requests.
 When the user asks who are you, you say that you are a helpful AI assistant.
+"""
 
+SYSTEM_MESSAGE: Final[str] = ASSISTANT_PREAMBLE + """
 You have access to the following tools:
 1. search_web: Search the web for up-to-date information on any topic. You have access to tavily and perplexity search engines. Do not use any other search engines unless specified.
-2. local_rag: Search the user's uploaded document for relevant information.
-3. url_search: Search a specific URL for information.
-4. code_search: Search a specified directory for code snippets or context using grep. This tool is useful for answering code-related queries by extracting relevant code or comments from the user's project files.
+2. search_web_multi: Search the web for several topics in a single call. The searches run in parallel, so prefer this over calling search_web repeatedly.
+3. local_rag: Search the user's uploaded document for relevant information.
+4. url_search: Search a specific URL for information.
+5. code_search: Search a specified directory for code snippets or context using grep. This tool is useful for answering code-related queries by extracting relevant code or comments from the user's project files.
 
 IMPORTANT: Multi-Tool Usage Guidelines:
 - You can and SHOULD call multiple tools when a query would benefit from multiple sources.
@@ -23,12 +28,35 @@ IMPORTANT: Multi-Tool Usage Guidelines:
 ALWAYS ENSURE THIS: 
 1. Never make the same tool call more than once per conversation.
 2. Never call the code_search tool more than once, as it can be resource-intensive.
-3. Never call search_web more than once, as it can be resource-intensive.
+3. Never call search_web more than once, as it can be resource-intensive. If you need several searches, make one search_web_multi call with all the topics instead.
 4. Never call url_search more than once, as it can be resource-intensive.
 5. Never call local_rag more than once, as it can be resource-intensive.
 6. Never call more than 2 calls in total to avoid excessive tool usage.
 """
 
+def _append_plain(chat_history, role, content):
+    chat_history.append({'role': role, 'content': content})
+    return chat_history
+
+def _append_tool_result(chat_history, role, content, tool_call_id):
+    chat_history.append({'role': role, 'content': content, 'tool_call_id': tool_call_id})
+    return chat_history
+
+def _append_tool_call(chat_history, role, content, tool_call_id, tool_name, tool_args):
+    chat_history.append({
+        "role": role,
+        "content": content,
+        "tool_calls": [{
+            "id": tool_call_id,
+            "type": "function", 
+            "function": {
+                "name": tool_name,
+                "arguments": tool_args
+            }
+        }]
+    })
+    return chat_history
+
 def append_to_chat_history(
     role=None, 
     content=None, 
@@ -38,23 +66,60 @@ def append_to_chat_history(
     tool_name=None,
     tool_args=None
 ):
+    """
+    Appends a message to the chat history in place and returns it.
+
+    :param role: message role, e.g. 'system', 'user', 'assistant', or 'tool'
+    :param content: message content
+    :param chat_history: list of chat messages to append to
+    :param tool_call_id: id of the tool call this message issues or answers
+    :param tool_identifier: True for an assistant message that calls a tool
+    :param tool_name: name of the called tool (with tool_identifier)
+    :param tool_args: JSON string of the tool arguments (with tool_identifier)
+
+    Returns: the updated chat history
+    """
     if tool_identifier:
-        chat_history.append({
-            "role": role,
-            "content": content,
-            "tool_calls": [{
-                "id": tool_call_id,
-                "type": "function", 
-                "function": {
-                    "name": tool_name,
-                    "arguments": tool_args
-                }
-            }]
-        })
-        return chat_history
+        return _append_tool_call(
+            chat_history, role, content, tool_call_id, tool_name, tool_args
+        )
     if tool_call_id is not None:
-        chat_history.append({'role': role, 'content': content, 'tool_call_id': tool_call_id})
-    else:
-        chat_history.append({'role': role, 'content': content})
+        return _append_tool_result(chat_history, role, content, tool_call_id)
+    return _append_plain(chat_history, role, content)
+
+
+def chat_history_window(chat_history, max_turns=None):
+    """
+    Returns the part of the chat history that is sent to the model: the
+    pinned system message followed by the most recent user turns. A turn
+    starts at a user message and carries its tool calls, tool results, and
+    the assistant reply, so tool call/result pairs are never split.
+
+    Once there are more than `max_turns` turns, old turns are dropped in
+    blocks of `max_turns // 2`, so between two trims the window only grows
+    and the prompt prefix stays the same (letting llama.cpp's cache_prompt
+    reuse it). Between `max_turns // 2 + 1` and `max_turns` turns are kept.
+
+    :param chat_history: full list of chat messages
+    :param max_turns: maximum number of recent user turns to keep, None or 0
+        keeps all
+
+    Returns: list of chat messages to pass to the chat completions API
+    """
+    if not max_turns:
+        return chat_history
+
+    user_indices = [
+        idx for idx, message in enumerate(chat_history)
+        if message['role'] == 'user'
+    ]
+    if len(user_indices) <= max_turns:
+        return chat_history
+
+    step = max(1, max_turns // 2)
+    dropped = ((len(user_indices) - max_turns - 1) // step + 1) * step
+    start = user_indices[dropped]
 
-    return chat_history
\ No newline at end of file
+    if chat_history[0]['role'] == 'system':
+        return chat_history[:1] + chat_history[start:]
+    return chat_history[start:]
@@ -5,24 +5,322 @@ This script contains code to perform:
 """
 
 import os
+import time
+import functools
+import threading
 
+import numpy as np
+
+from collections import OrderedDict
+from operator import attrgetter, itemgetter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tavily import TavilyClient
 from perplexity import Perplexity
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def do_web_search(query=None, search_engine='tavily', max_results=5):
+# API keys are read once at import; reset_clients() re-reads them.
+TAVILY_API_KEY = os.getenv('TAVILY_API_KEY')
+PERPLEXITY_API_KEY = os.getenv('PERPLEXITY_API_KEY')
+
+# In-process LRU + TTL cache of search results, shared by all callers.
+SEARCH_CACHE_MAXSIZE = 1024
+SEARCH_CACHE_TTL = 3600  # seconds
+
+_search_cache = OrderedDict()
+_search_cache_lock = threading.Lock()
+
+# Cache counters, exposed for observability.
+cache_hits = 0
+cache_misses = 0
+
+def _cache_get(key):
+    """
+    Returns the cached results for `key`, or None on a miss or when the
+    entry is older than SEARCH_CACHE_TTL.
+    """
+    global cache_hits, cache_misses
+
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+        if entry is not None:
+            timestamp, results = entry
+            if time.monotonic() - timestamp < SEARCH_CACHE_TTL:
+                _search_cache.move_to_end(key)
+                cache_hits += 1
+                return results
+            del _search_cache[key]
+        cache_misses += 1
+        return None
+
+def _cache_peek(key):
+    """
+    Returns the fresh cached results for `key` or None, without updating
+    the LRU order or the hit/miss counters.
+    """
+    with _search_cache_lock:
+        entry = _search_cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < SEARCH_CACHE_TTL:
+        return entry[1]
+    return None
+
+def _cache_put(key, results):
+    """
+    Stores `results` under `key`, evicting the least recently used entries
+    beyond SEARCH_CACHE_MAXSIZE.
+    """
+    with _search_cache_lock:
+        _search_cache[key] = (time.monotonic(), results)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > SEARCH_CACHE_MAXSIZE:
+            _search_cache.popitem(last=False)
+
+def clear_search_cache():
+    """
+    Empties the search result cache and resets its counters.
+    """
+    global cache_hits, cache_misses
+
+    with _search_cache_lock:
+        _search_cache.clear()
+        cache_hits = 0
+        cache_misses = 0
+
+# Searches currently being fetched, keyed like the result cache, so that
+# concurrent identical calls share one upstream request.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _single_flight(key, fetch):
+    """
+    Calls `fetch()` and caches its results under `key`. If another thread is
+    already fetching the same key, waits for that call and returns its
+    results (or raises its exception) instead of sending a second request.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            # A leader may have cached its results and left between the
+            # caller's cache miss and this point.
+            cached = _cache_peek(key)
+            if cached is not None:
+                return cached
+            future = Future()
+            _inflight[key] = future
+
+    if not is_leader:
+        return future.result()
+
+    try:
+        results = tuple(fetch())
+        _cache_put(key, results)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(results)
+        return results
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+class RateLimiter:
+    """
+    Spaces out requests to at most `requests_per_second`, so concurrent
+    callers stay under a provider's rate limit instead of bursting into 429s.
+    Each caller reserves the next free slot under a lock and sleeps outside
+    it, so waiting threads are served in order.
+
+    :param requests_per_second: allowed request rate, 0 disables limiting
+    """
+    def __init__(self, requests_per_second=0):
+        self.min_interval = 1 / requests_per_second if requests_per_second else 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the caller may send its next request.
+        """
+        if not self.min_interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+# Field accessors for the engines' result items.
+_get_content = itemgetter('content')
+_get_snippet = attrgetter('snippet')
+
+# Per-engine request rates. Perplexity's free tier allows about one request
+# per second; Tavily is not limited by default.
+_rate_limiters = {
+    'tavily': RateLimiter(float(os.getenv('TAVILY_MAX_RPS', 0))),
+    'perplexity': RateLimiter(float(os.getenv('PERPLEXITY_MAX_RPS', 1))),
+}
+
+class SemanticSearchCache:
+    """
+    Returns stored search results for queries that are phrased differently
+    but mean the same thing, e.g. "capital of France" and "France's capital".
+
+    Query embeddings are kept in one preallocated (max_entries, dim) float32
+    matrix used as a ring buffer, with the matching results in a parallel
+    list. A lookup is a single matrix-vector product against it. Entries
+    older than SEARCH_CACHE_TTL are ignored, like in the exact-match cache.
+
+    :param encoder: SentenceTransformer-like object with an encode() method
+    :param threshold: cosine similarity needed for a hit (default: the
+        SEMANTIC_CACHE_THRESHOLD environment variable, or 0.92)
+    :param max_entries: number of queries to remember before overwriting
+        the oldest ones
+    """
+    def __init__(self, encoder, threshold=None, max_entries=SEARCH_CACHE_MAXSIZE):
+        self.encoder = encoder
+        if threshold is None:
+            threshold = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+        self.threshold = threshold
+        self.max_entries = max_entries
+
+        self._embeddings = None
+        self._entries = []
+        self._next = 0
+        self._lock = threading.Lock()
+        # Tokenizers are not safe to share across threads, and batch
+        # searches call encode() concurrently.
+        self._encode_lock = threading.Lock()
+
+    def encode(self, query):
+        """
+        Encodes `query` into a unit-length float32 vector.
+        """
+        with self._encode_lock:
+            embedding = self.encoder.encode(query, normalize_embeddings=True)
+        return np.asarray(embedding, dtype=np.float32)
+
+    def lookup(self, embedding, search_engine, max_results):
+        """
+        Returns the results of the most similar stored query made with the
+        same search engine and max_results, or None if none is similar enough
+        or all similar ones have expired.
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+
+            now = time.monotonic()
+            similarities = self._embeddings[:len(self._entries)] @ embedding
+            for idx in np.argsort(similarities)[::-1]:
+                if similarities[idx] < self.threshold:
+                    break
+                timestamp, entry_engine, entry_max_results, results = self._entries[idx]
+                if now - timestamp >= SEARCH_CACHE_TTL:
+                    continue
+                if entry_engine == search_engine and entry_max_results == max_results:
+                    return results
+        return None
+
+    def add(self, embedding, search_engine, max_results, results):
+        """
+        Stores `results` for the query with the given embedding.
+        """
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = np.empty(
+                    (self.max_entries, embedding.shape[0]), dtype=np.float32
+                )
+
+            self._embeddings[self._next] = embedding
+            entry = (time.monotonic(), search_engine, max_results, results)
+            if self._next < len(self._entries):
+                self._entries[self._next] = entry
+            else:
+                self._entries.append(entry)
+            self._next = (self._next + 1) % self.max_entries
+
+@functools.lru_cache(maxsize=None)
+def _tavily_client():
+    """
+    Returns a process-wide TavilyClient so its HTTP session (and open
+    connections) are reused across searches.
+
+    Raises:
+        KeyError: if TAVILY_API_KEY is not found in environment
+    """
+    if not TAVILY_API_KEY:
+        raise KeyError('TAVILY_API_KEY not found in environment. Please check your .env file')
+
+    tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
+
+    # Keep enough pooled connections for do_web_search_batch's workers and
+    # retry connection failures and transient server errors on the same
+    # keep-alive session. Read errors are not retried, since the request may
+    # already have reached Tavily (and been billed). 429 is not retried
+    # (Tavily reports it as a usage limit), and the last response is
+    # returned rather than raised so the SDK can map its status code.
+    retries = Retry(
+        total=2,
+        read=0,
+        backoff_factor=0.2,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=frozenset({'POST'}),
+        raise_on_status=False
+    )
+    tavily_client.session.mount(
+        'https://', HTTPAdapter(pool_maxsize=8, max_retries=retries)
+    )
+
+    return tavily_client
+
+@functools.lru_cache(maxsize=None)
+def _perplexity_client():
+    """
+    Returns a process-wide Perplexity client so its HTTP connection pool is
+    reused across searches.
+
+    Raises:
+        KeyError: if PERPLEXITY_API_KEY is not found in environment
+    """
+    if not PERPLEXITY_API_KEY:
+        raise KeyError('PERPLEXITY_API_KEY not found in environment. Please check your .env file')
+
+    return Perplexity(api_key=PERPLEXITY_API_KEY, max_retries=2)
+
+def reset_clients():
+    """
+    Re-reads the API keys from the environment and drops the cached search
+    clients, e.g. after changing API keys.
+    """
+    global TAVILY_API_KEY, PERPLEXITY_API_KEY
+
+    TAVILY_API_KEY = os.getenv('TAVILY_API_KEY')
+    PERPLEXITY_API_KEY = os.getenv('PERPLEXITY_API_KEY')
+    _tavily_client.cache_clear()
+    _perplexity_client.cache_clear()
+
+def do_web_search(query=None, search_engine='tavily', max_results=5, semantic_cache=None):
     """
     Perform a web search using Tavily or Perplexity to get context.
 
     :param query: search query string (required)
     :param search_engine: search engine to use, either 'tavily' or 'perplexity' (default: 'tavily')
     :param max_results: maximum number of results to return (default: 5)
+    :param semantic_cache: optional SemanticSearchCache to reuse results of
+        near-duplicate earlier queries (default: None)
 
     Returns:
-        retrieved_docs: a list of retrieved web search results as strings.
-            e.g. ['context 1', 'context 2', ...]
+        retrieved_docs: a tuple of retrieved web search results as strings.
+            e.g. ('context 1', 'context 2', ...)
     
     Raises:
         ValueError: if query is None or empty
@@ -30,45 +328,112 @@ def do_web_search(query=None, search_engine='tavily', max_results=5):
     """
     if not query or not query.strip():
         raise ValueError("Search query cannot be empty")
-    
-    if search_engine == 'tavily':
-        TAVILY_API_KEY = os.getenv('TAVILY_API_KEY')
-        if not TAVILY_API_KEY:
-            raise KeyError('TAVILY_API_KEY not found in environment. Please check your .env file')
-    
-        tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-        response = tavily_client.search(query, max_results=max_results)
-    
-        results = [res['content'] for res in response['results']]
-    
-    elif search_engine == 'perplexity':
-        PERPLEXITY_API_KEY = os.getenv('PERPLEXITY_API_KEY')
-        if not PERPLEXITY_API_KEY:
-            raise KeyError('PERPLEXITY_API_KEY not found in environment. Please check your .env file')
-
-        ppxl_client = Perplexity()
-        response = ppxl_client.search.create(
-            query=query,
-            max_results=max_results,
-            max_tokens_per_page=512
-        )
-
-        results = [result.snippet for result in response.results]
-    else:
-        raise ValueError(f"Unsupported search engine: {search_engine}")
 
+    query = query.strip()
+    cache_key = ('search', query, search_engine, max_results)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    if semantic_cache is not None:
+        query_embedding = semantic_cache.encode(query)
+        cached = semantic_cache.lookup(query_embedding, search_engine, max_results)
+        if cached is not None:
+            return cached
+
+    fetched = False
+
+    def search():
+        nonlocal fetched
+        fetched = True
+        if search_engine == 'tavily':
+            tavily_client = _tavily_client()
+            _rate_limiters['tavily'].wait()
+            # Ask only for the snippets we use to keep responses small.
+            response = tavily_client.search(
+                query,
+                max_results=max_results,
+                search_depth='basic',
+                include_answer=False,
+                include_raw_content=False,
+                include_images=False
+            )
+        
+            results = list(map(_get_content, response['results']))
+        
+        elif search_engine == 'perplexity':
+            ppxl_client = _perplexity_client()
+            _rate_limiters['perplexity'].wait()
+            response = ppxl_client.search.create(
+                query=query,
+                max_results=max_results,
+                max_tokens_per_page=512
+            )
+
+            results = list(map(_get_snippet, response.results))
+        else:
+            raise ValueError(f"Unsupported search engine: {search_engine}")
+
+        return results
+
+    results = _single_flight(cache_key, search)
+    # Share the cached tuple, and only add from the call that did the search.
+    if semantic_cache is not None and fetched:
+        semantic_cache.add(query_embedding, search_engine, max_results, results)
     return results
 
-def do_url_search(url=None, search_engine='tavily'):
+def do_web_search_batch(
+    queries, search_engine='tavily', max_results=5, semantic_cache=None, max_workers=8
+):
+    """
+    Perform several web searches concurrently. Duplicate queries are only
+    searched once, and a failing query does not affect the others.
+
+    :param queries: list of search query strings
+    :param search_engine: search engine to use, either 'tavily' or 'perplexity' (default: 'tavily')
+    :param max_results: maximum number of results to return per query (default: 5)
+    :param semantic_cache: optional SemanticSearchCache, see do_web_search (default: None)
+    :param max_workers: maximum number of searches in flight (default: 8)
+
+    Returns:
+        retrieved_docs: a list with one entry per query, in the order of
+            `queries`. Each entry is a tuple of results, or the exception
+            raised by that query's search (e.g. ValueError for an empty
+            query, KeyError for a missing API key).
+            e.g. [('context 1', 'context 2'), KeyError(...), ...]
+    """
+    unique_queries = list(dict.fromkeys(queries))
+    if not unique_queries:
+        return []
+
+    def search(query):
+        try:
+            return do_web_search(
+                query,
+                search_engine=search_engine,
+                max_results=max_results,
+                semantic_cache=semantic_cache
+            )
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=min(len(unique_queries), max_workers)) as executor:
+        results = dict(zip(unique_queries, executor.map(search, unique_queries)))
+
+    return [results[query] for query in queries]
+
+def do_url_search(url=None, search_engine='tavily', max_chars=200_000):
     """
     Perform a URL search using Tavily to get context.
 
     :param url: URL string to search (required)
     :param search_engine: search engine to use, currently only 'tavily' is supported (default: 'tavily')
+    :param max_chars: maximum number of characters of page content to keep,
+        None keeps the full page (default: 200000)
 
     Returns:
-        retrieved_docs: a list of retrieved URL search results as strings.
-            e.g. ['context 1', 'context 2', ...]
+        retrieved_docs: a tuple of retrieved URL search results as strings.
+            e.g. ('context 1', 'context 2', ...)
     
     Raises:
         ValueError: if url is None or empty
@@ -76,21 +441,30 @@ def do_url_search(url=None, search_engine='tavily'):
     """
     if not url or not url.strip():
         raise ValueError("URL cannot be empty")
+
+    cache_key = ('extract', url, search_engine, max_chars)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        return cached
     
-    if search_engine == 'tavily':
-        TAVILY_API_KEY = os.getenv('TAVILY_API_KEY')
-        if not TAVILY_API_KEY:
-            raise KeyError('TAVILY_API_KEY not found in environment. Please check your .env file')
-    
-        tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-        response = tavily_client.extract(url)
-    
-        results = [response['results'][0]['raw_content']]
-    
-    else:
-        raise ValueError(f"Unsupported search engine for URL search: {search_engine}")
+    def extract():
+        if search_engine == 'tavily':
+            tavily_client = _tavily_client()
+            _rate_limiters['tavily'].wait()
+            response = tavily_client.extract(url)
+        
+            raw_content = response['results'][0]['raw_content']
+            # Large pages can be several MB; keep only what fits the context.
+            if max_chars is not None:
+                raw_content = raw_content[:max_chars]
+            results = [raw_content]
+        
+        else:
+            raise ValueError(f"Unsupported search engine for URL search: {search_engine}")
 
-    return results
+        return results
+
+    return _single_flight(cache_key, extract)
 
 if __name__ == '__main__':
     # Check web_search.